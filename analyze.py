@@ -1,4 +1,5 @@
-import matplotlib.pyplot as plt
+import heapq
+import numpy as np
 
 
 def total_variation_distance(counts: dict, reference_counts: dict, num_shots: int) -> float:
@@ -12,17 +13,12 @@ def total_variation_distance(counts: dict, reference_counts: dict, num_shots: in
     Returns:
         float: Total variation distance.
     """
-    # Get all possible keys from both distributions
-    all_keys = set(counts.keys()) | set(reference_counts.keys())
+    # Subtract observed counts from a copy of the reference in a single sweep
+    diff = dict(reference_counts)
+    for key, count in counts.items():
+        diff[key] = diff.get(key, 0) - count
 
-    # Calculate TVD
-    tvd = 0.0
-    for key in all_keys:
-        p = counts.get(key, 0) / num_shots
-        q = reference_counts.get(key, 0) / num_shots
-        tvd += abs(p - q)
-
-    return 0.5 * tvd
+    return 0.5 * sum(map(abs, diff.values())) / num_shots
 
 
 def dominant_state_percentile(counts: dict, num_shots: int, top_n: int = 1) -> float:
@@ -35,51 +31,68 @@ def dominant_state_percentile(counts: dict, num_shots: int, top_n: int = 1) -> f
     Returns:
         float: Percentage of shots in the top N states.
     """
-    sorted_counts = sorted(counts.values(), reverse=True)
-    top_counts = sum(sorted_counts[:top_n])
+    top_counts = sum(heapq.nlargest(top_n, counts.values()))
     return (top_counts / num_shots) * 100
 
 
-def analyze_results(name: str, expected: dict, baseline: dict, static_obf: dict, static_recovered: dict, dynamic_obf: dict, dynamic_recovered: dict, num_shots: int):
+def counts_to_vec(counts, num_qubits: int) -> np.ndarray:
+    """
+    Convert measurement counts to a dense vector indexed by integer outcome.
+    Args:
+        counts (dict | np.ndarray): Measurement counts keyed by bitstring, or an existing count vector.
+        num_qubits (int): Number of measured qubits.
+    Returns:
+        np.ndarray: Vector of length 2**num_qubits holding the count of each outcome.
+    """
+    if isinstance(counts, np.ndarray):
+        return counts
+
+    vec = np.zeros(1 << num_qubits, dtype=np.float64)
+    for key, count in counts.items():
+        vec[int(key, 2)] += count
+    return vec
+
+
+def analyze_results(name: str, expected, baseline, static_obf, static_recovered, dynamic_obf, dynamic_recovered, num_shots: int, num_qubits: int = 10):
     """
     Analyze and plot results from the three experiments.
-    Generates bar charts for TVD and dominant state percentile, plus overlaid PDF.
+    Generates bar charts for TVD and dominant state percentile, saved to obfuscation_analysis_<name>.png.
     Args:
         name (str): Name of the gate being analyzed.
-        expected (dict): Expected measurement counts.
-        baseline (dict): Counts from baseline simulation.
-        static_obf (dict): Counts from static obfuscation simulation.
-        static_recovered (dict): Recovered counts from static recovery simulation.
-        dynamic_obf (dict): Counts from dynamic obfuscation simulation.
-        dynamic_recovered (dict): Recovered counts from dynamic recovery simulation.
+        expected (dict | np.ndarray): Expected measurement counts.
+        baseline (dict | np.ndarray): Counts from baseline simulation.
+        static_obf (dict | np.ndarray): Counts from static obfuscation simulation.
+        static_recovered (dict | np.ndarray): Recovered counts from static recovery simulation.
+        dynamic_obf (dict | np.ndarray): Counts from dynamic obfuscation simulation.
+        dynamic_recovered (dict | np.ndarray): Recovered counts from dynamic recovery simulation.
         num_shots (int): Number of shots used in each simulation.
+        num_qubits (int): Number of measured qubits in each distribution.
     """
+    # Stack every distribution as a dense count vector so all metrics come from one sweep over the matrix
+    # Rows: 0 expected, 1 baseline, 2 static, 3 static recovered, 4 dynamic, 5 dynamic recovered
+    mat = np.stack([
+        counts_to_vec(counts, num_qubits)
+        for counts in (expected, baseline, static_obf, static_recovered, dynamic_obf, dynamic_recovered)
+    ])
+    tvds = 0.5 * np.abs(mat - mat[0]).sum(axis=1) / num_shots
+    doms = mat.max(axis=1) / num_shots * 100
+
     # Define experiment labels
     experiments_4 = ['Expected', 'Baseline', 'Static', 'Dynamic']
     experiments_3 = ['Baseline', 'Static', 'Dynamic']
 
     # Calculate metrics
-    # Plot 1: Recovered distributions TVD (4 bars including Expected)
-    recovered_tvd_values = [
-        total_variation_distance(baseline, expected, num_shots),
-        total_variation_distance(static_recovered, expected, num_shots),
-        total_variation_distance(dynamic_recovered, expected, num_shots)
-    ]
+    # Plot 1: Recovered distributions TVD (3 bars)
+    recovered_tvd_values = tvds[[1, 3, 5]].tolist()
 
     # Plot 2: Actual (non-recovered) distributions TVD (3 bars only)
-    actual_tvd_values = [
-        total_variation_distance(baseline, expected, num_shots),
-        total_variation_distance(static_obf, expected, num_shots),
-        total_variation_distance(dynamic_obf, expected, num_shots)
-    ]
+    actual_tvd_values = tvds[[1, 2, 4]].tolist()
 
     # Plot 3: Dominant state percentile (4 bars including Expected)
-    dominant_values = [
-        dominant_state_percentile(expected, num_shots),
-        dominant_state_percentile(baseline, num_shots),
-        dominant_state_percentile(static_obf, num_shots),
-        dominant_state_percentile(dynamic_obf, num_shots)
-    ]
+    dominant_values = doms[[0, 1, 2, 4]].tolist()
+
+    # Import pyplot lazily so the metric helpers can be used without loading matplotlib
+    import matplotlib.pyplot as plt
 
     # Create figure with 3 subplots
     fig, axes = plt.subplots(1, 3, figsize=(18, 5))
@@ -108,8 +121,8 @@ def analyze_results(name: str, expected: dict, baseline: dict, static_obf: dict,
     axes[2].tick_params(axis='x', rotation=15)
 
     plt.tight_layout()
-    plt.savefig('obfuscation_analysis.png', dpi=150)
-    plt.show()
+    plt.savefig(f'obfuscation_analysis_{name}.png', dpi=150)
+    plt.close(fig)
 
     # Print metrics
     print("\n=== Analysis Results ===")
@@ -1,13 +1,44 @@
-from qiskit import QuantumCircuit
-from qiskit.qasm2 import loads
+import os
+from functools import lru_cache
+from qiskit import QuantumCircuit, qpy
+from qiskit.converters import circuit_to_dag, dag_to_circuit
 
+# Gates are pure functions of their QASM file, so parse each path only once per process
+@lru_cache(maxsize=None)
 def load_gate(qasm_path: str):
+    # Reuse the QPY copy written next to the QASM file unless the QASM file is newer
+    cache_path = qasm_path + ".qpy"
+    if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(qasm_path):
+        # The cache is best-effort: a truncated file or one written by a newer Qiskit
+        # can fail in several ways, so any failure falls back to parsing the QASM
+        try:
+            with open(cache_path, "rb") as f:
+                return qpy.load(f)[0].to_gate()
+        except Exception:
+            pass
+
     qc = QuantumCircuit.from_qasm_file(qasm_path)
-    # Remove this line: qc = qc.decompose()
     qc = qc.remove_final_measurements(inplace=False)
-    
-    clean = QuantumCircuit(qc.num_qubits)
-    for instr, qargs, _ in qc.data:
-        clean.append(instr, [clean.qubits[qc.find_bit(q).index] for q in qargs])
-    
-    return clean.to_gate()
+
+    # Drop classical bits that were already idle (remove_final_measurements only removes newly idle ones)
+    if qc.num_clbits:
+        dag = circuit_to_dag(qc)
+        dag.remove_cregs(*dag.cregs.values())
+        dag.remove_clbits(*dag.clbits)
+        qc = dag_to_circuit(dag)
+
+    # Writing the cache is best-effort too; a read-only checkout or a failed dump just parses the QASM every time.
+    # Write to a temporary file first so concurrent loaders never read a partial cache.
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            qpy.dump(qc, f)
+        os.replace(tmp_path, cache_path)
+    except Exception:
+        pass
+    finally:
+        # Only left behind when the write failed before the rename
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return qc.to_gate()
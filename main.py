@@ -1,6 +1,40 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+# Render plots off-screen so batch runs never block on a GUI window
+import matplotlib
+matplotlib.use('Agg')
+
 from load import load_gate
-from simulation import run_baseline_simulation, run_obfuscation_simulation
-from analyze import analyze_results
+from simulation import run_baseline_simulation, run_obfuscation_both
+from analyze import analyze_results, counts_to_vec
+
+GATE_PATHS = {
+    "ghz_gate": "circuits/ghz_indep_qiskit_3.qasm",
+    "w_gate": "circuits/wstate_indep_qiskit_3.qasm",
+    "grover_gate": "circuits/grover-noancilla_indep_qiskit_3.qasm",
+    "qft_gate": "circuits/qft_indep_qiskit_3.qasm",
+}
+MODES = ["baseline", "obfuscation"]
+
+
+def simulate_one(gate_qasm_path: str, mode: str, num_shots: int):
+    """
+    Load a gate block and run one of its simulations. Runs inside a worker process,
+    so the gate is loaded from its QASM path rather than pickled.
+    Args:
+        gate_qasm_path (str): Path to the QASM file of the gate block.
+        mode (str): Either "baseline" or "obfuscation" (static and dynamic together).
+        num_shots (int): Number of shots for the simulation.
+    Returns:
+        dict | tuple: Baseline counts, or (static_obf, static_recovered, dynamic_obf, dynamic_recovered).
+    """
+    gate = load_gate(gate_qasm_path)
+    if mode == "baseline":
+        return run_baseline_simulation(num_shots=num_shots, gate=gate)
+    # Every (gate, mode) pair already has its own worker process, so keep Aer to one experiment at a time
+    return run_obfuscation_both(num_shots=num_shots, obfuscation_interval=10, gate=gate, max_parallel_experiments=1)
+
 
 # ------------------------------------------------------------------
 # Main execution
@@ -8,18 +42,7 @@ from analyze import analyze_results
 if __name__ == "__main__":
     NUM_SHOTS = 5000
 
-    # Load gate blocks
-    ghz_gate = load_gate("circuits/ghz_indep_qiskit_3.qasm")
-    print("Loaded GHZ gate")
-    w_gate = load_gate("circuits/wstate_indep_qiskit_3.qasm")
-    print("Loaded W-state gate")
-    grover_gate = load_gate("circuits/grover-noancilla_indep_qiskit_3.qasm")
-    print("Loaded Grover gate")
-    qft_gate = load_gate("circuits/qft_indep_qiskit_3.qasm")
-    print("Loaded QFT gate")
-
     # Compute expected distributions
-    gates = [(ghz_gate, "ghz_gate"), (w_gate, "w_gate"), (grover_gate, "grover_gate"), (qft_gate, "qft_gate")]
     ghz_expected = {'0000000000': NUM_SHOTS / 2, '0000111000': NUM_SHOTS / 2}
     w_expected = {'0000100000': NUM_SHOTS / 3, '0000010000': NUM_SHOTS / 3, '0000001000': NUM_SHOTS / 3}
     grover_expected = {'0000111000': NUM_SHOTS}
@@ -31,20 +54,27 @@ if __name__ == "__main__":
                 key = f"0000{b4}{b5}{b6}000"
                 qft_expected[key] = NUM_SHOTS / 8
     
+    # Store expected distributions as dense count vectors indexed by integer outcome
     expected_distributions = {
-        "ghz_gate": ghz_expected,
-        "w_gate": w_expected,
-        "grover_gate": grover_expected,
-        "qft_gate": qft_expected,
+        "ghz_gate": counts_to_vec(ghz_expected, 10),
+        "w_gate": counts_to_vec(w_expected, 10),
+        "grover_gate": counts_to_vec(grover_expected, 10),
+        "qft_gate": counts_to_vec(qft_expected, 10),
     }
 
-    # Run simulations and analyze results for each gate
-    for gate, name in gates:
-        print(f"\n=== Running simulations for gate: {name} ===")
-        print(gate)
-        baseline = run_baseline_simulation(num_shots=NUM_SHOTS, gate=gate)
-        static_obf, static_recovered = run_obfuscation_simulation(num_shots=NUM_SHOTS, obfuscation_interval=10, gate=gate, static=True)
-        dynamic_obf, dynamic_recovered = run_obfuscation_simulation(num_shots=NUM_SHOTS, obfuscation_interval=10, gate=gate, static=False)
+    # Run every (gate, mode) simulation in parallel
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        futures = {
+            (name, mode): executor.submit(simulate_one, path, mode, NUM_SHOTS)
+            for name, path in GATE_PATHS.items()
+            for mode in MODES
+        }
+        results = {key: future.result() for key, future in futures.items()}
 
-        analyze_results(name, expected_distributions[name], baseline, static_obf, static_recovered, dynamic_obf, dynamic_recovered, NUM_SHOTS)
+    # Analyze results for each gate
+    for name in GATE_PATHS:
+        print(f"\n=== Analyzing simulations for gate: {name} ===")
+        baseline = results[(name, "baseline")]
+        static_obf, static_recovered, dynamic_obf, dynamic_recovered = results[(name, "obfuscation")]
 
+        analyze_results(name, expected_distributions[name], baseline, static_obf, static_recovered, dynamic_obf, dynamic_recovered, NUM_SHOTS)
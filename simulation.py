@@ -1,9 +1,44 @@
-from qiskit import QuantumCircuit, transpile
+from qiskit import ClassicalRegister, QuantumCircuit, qasm2, transpile
 from qiskit_aer import AerSimulator
 from qiskit.circuit.random import random_circuit
-from collections import defaultdict
-import matplotlib.pyplot as plt
-import random
+from qiskit.qasm2 import QASM2ExportError
+from qiskit.transpiler.exceptions import TranspilerError
+from collections import OrderedDict
+from functools import lru_cache
+from itertools import chain
+from typing import Optional
+import numpy as np
+
+
+@lru_cache(maxsize=None)
+def _simulator() -> AerSimulator:
+    """
+    Build the shared simulator backend on first use, reused by every simulation in this module.
+    With only final measurements, the statevector method evolves each circuit once and samples all shots from it.
+    Use the GPU build of Aer when one is installed, batching the shots and experiments of a job on the device.
+    Building it lazily keeps the device probe out of processes that only import this module,
+    such as the parent of main.py's worker pool, where a CUDA context would not survive the fork.
+    Returns:
+        AerSimulator: The shared simulator.
+    """
+    if 'GPU' in AerSimulator().available_devices():
+        return AerSimulator(method='statevector', device='GPU', batched_shots_gpu=True, batched_shots_gpu_max_qubits=16)
+    return AerSimulator(method='statevector')
+
+
+@lru_cache(maxsize=None)
+def _native_ops() -> frozenset:
+    """
+    Return the operations the shared simulator executes natively, without transpiling.
+    Returns:
+        frozenset: Names of the natively supported operations.
+    """
+    return frozenset(_simulator().target.operation_names) | {'barrier'}
+
+
+# Most recently used transpiled circuits keyed by (OpenQASM source, backend name)
+_TRANSPILE_CACHE = OrderedDict()
+_TRANSPILE_CACHE_SIZE = 128
 
 
 def build_circuit_with_gate(
@@ -16,7 +51,7 @@ def build_circuit_with_gate(
     Build a quantum circuit with a specified gate block inserted at a given start index.
     Args:
         num_qubits (int): Total number of qubits in the circuit.
-        gate (Gate): The gate block to insert.
+        gate (Gate | QuantumCircuit): The gate block to insert; circuits are inlined.
         start_index (int): The starting qubit index to insert the gate block.
         measure (bool): Whether to include measurements at the end.
     Returns:
@@ -30,7 +65,11 @@ def build_circuit_with_gate(
 
     # Build the circuit
     qubits = list(range(start_index, start_index + gate.num_qubits))
-    qc.append(gate, qubits)
+    if isinstance(gate, QuantumCircuit):
+        # Pre-lowered gate blocks are inlined so the transpiler does not unroll them again
+        qc.compose(gate, qubits=qubits, inplace=True)
+    else:
+        qc.append(gate, qubits)
 
     if measure:
         qc.measure(range(num_qubits), range(num_qubits))
@@ -46,114 +85,424 @@ def simulate_circuit(qc, shots: int):
         shots (int): Number of shots for the simulation.
     Returns:
         dict: Measurement counts."""
-    sim = AerSimulator()
-    compiled = transpile(qc, sim)
+    sim = _simulator()
+    compiled = _transpile_cached(qc, sim)
     result = sim.run(compiled, shots=shots).result()
     return result.get_counts()
 
 
-def run_baseline_simulation(num_shots: int, gate):
+def _transpile_cached(qc: QuantumCircuit, sim) -> QuantumCircuit:
+    """
+    Transpile a circuit for the given backend, reusing the result for recently seen identical circuits.
+    Args:
+        qc (QuantumCircuit): The quantum circuit to transpile.
+        sim (AerSimulator): The backend to transpile for.
+    Returns:
+        QuantumCircuit: The transpiled circuit.
+    """
+    try:
+        key = (qasm2.dumps(qc), sim.name)
+    except QASM2ExportError:
+        # Circuits OpenQASM 2 cannot express have no cache key, so transpile them directly
+        return transpile(qc, sim, optimization_level=0)
+
+    if key in _TRANSPILE_CACHE:
+        _TRANSPILE_CACHE.move_to_end(key)
+        return _TRANSPILE_CACHE[key]
+
+    compiled = transpile(qc, sim, optimization_level=0)
+    _TRANSPILE_CACHE[key] = compiled
+    if len(_TRANSPILE_CACHE) > _TRANSPILE_CACHE_SIZE:
+        _TRANSPILE_CACHE.popitem(last=False)
+    return compiled
+
+
+def run_baseline_simulation(num_shots: int, gate, verbose: bool = False):
     """
     Run a baseline simulation with the gate block in a fixed position.
     Args:
         num_shots (int): Number of shots for the simulation.
         gate (Gate): The gate block to insert.
+        verbose (bool): If True, print the sorted baseline counts.
     Returns:
         dict: Measurement counts from the baseline simulation.
     """
     qc = build_circuit_with_gate(num_qubits=10, gate=gate, start_index=3)
     counts_baseline = simulate_circuit(qc, shots=num_shots)
-    print("\n=== Baseline Counts ===")
-    for key in sorted(counts_baseline.keys()):
-        print(f"{key}: {counts_baseline[key]}")
+    if verbose:
+        print("\n=== Baseline Counts ===\n" + "\n".join(f"{k}: {v}" for k, v in sorted(counts_baseline.items())))
     return counts_baseline
 
 
+def _random_block(num_qubits: int, seed: Optional[int], cache: Optional[dict] = None) -> QuantumCircuit:
+    """
+    Generate a random circuit to place around the gate block.
+    Args:
+        num_qubits (int): Number of qubits of the random circuit.
+        seed (int | None): Seed for the random circuit; None draws fresh entropy.
+        cache (dict | None): If given, seeded circuits keyed by (num_qubits, seed), reused and filled in.
+    Returns:
+        QuantumCircuit: The random circuit.
+    """
+    if seed is None:
+        return _to_native(random_circuit(num_qubits=num_qubits, depth=4, max_operands=2))
+    if cache is None:
+        return _seeded_random_block(num_qubits, seed)
+
+    # Seeded blocks are deterministic, so trials drawing their seeds from a pool reuse generated circuits
+    key = (num_qubits, seed)
+    if key not in cache:
+        cache[key] = _seeded_random_block(num_qubits, seed)
+    return cache[key]
+
+
+def _seeded_random_block(num_qubits: int, seed: int) -> QuantumCircuit:
+    """
+    Generate a seeded random circuit, expanded to natively supported operations.
+    Args:
+        num_qubits (int): Number of qubits of the random circuit.
+        seed (int): Seed for the random circuit.
+    Returns:
+        QuantumCircuit: The random circuit.
+    """
+    return _to_native(random_circuit(num_qubits=num_qubits, depth=4, max_operands=2, seed=seed))
+
+
+def _to_native(qc: QuantumCircuit) -> QuantumCircuit:
+    """
+    Expand any operation the simulator does not run natively into its definition, recursively.
+    This is much cheaper than a transpile pass for the handful of such gates random_circuit emits.
+    Args:
+        qc (QuantumCircuit): The circuit to expand.
+    Returns:
+        QuantumCircuit: An equivalent circuit using only natively supported operations.
+    """
+    native_ops = _native_ops()
+    if native_ops.issuperset(qc.count_ops()):
+        return qc
+
+    native = qc.copy_empty_like()
+    for instruction in qc.data:
+        if instruction.operation.name in native_ops or instruction.operation.definition is None:
+            # Operations without a definition are left for the transpiler
+            native.append(instruction.operation, instruction.qubits, instruction.clbits)
+        else:
+            native.compose(_to_native(instruction.operation.definition), qubits=instruction.qubits, inplace=True)
+    return native
+
+
+def build_obfuscated_circuit(
+    num_qubits: int,
+    gate,
+    start_index: int,
+    top_seed: Optional[int] = None,
+    bottom_seed: Optional[int] = None,
+    block_cache: Optional[dict] = None,
+) -> QuantumCircuit:
+    """
+    Build a measured circuit with the gate block at start_index, surrounded by random circuits.
+    Args:
+        num_qubits (int): Total number of qubits in the circuit.
+        gate (Gate | QuantumCircuit): The gate block to insert; circuits are inlined.
+        start_index (int): The starting qubit index to insert the gate block.
+        top_seed (int | None): Seed for the random circuit before the gate block.
+        bottom_seed (int | None): Seed for the random circuit after the gate block.
+        block_cache (dict | None): If given, reuse seeded random circuits across calls through this dict.
+    Returns:
+        QuantumCircuit: The constructed quantum circuit.
+    """
+    # Build circuit with gate at the requested position
+    qc = build_circuit_with_gate(
+        num_qubits=num_qubits,
+        gate=gate,
+        start_index=start_index,
+        measure=False,
+    )
+
+    # Random circuit BEFORE gate
+    if start_index > 0:
+        rand_top = _random_block(start_index, top_seed, block_cache)
+        qc.compose(rand_top, qubits=list(range(start_index)), inplace=True)
+
+    # Random circuit AFTER gate
+    end_index = start_index + gate.num_qubits
+    if end_index < num_qubits:
+        rand_bottom = _random_block(num_qubits - end_index, bottom_seed, block_cache)
+        qc.compose(rand_bottom, qubits=list(range(end_index, num_qubits)), inplace=True)
+
+    # Measure into a single register added here, without the barrier measure_all() would insert
+    qc.add_register(ClassicalRegister(num_qubits, 'meas'))
+    qc.measure(range(num_qubits), range(num_qubits))
+    return qc
+
+
+def _transpile_trial(trial_idx: int, qc: QuantumCircuit, gate, start_idx: int, sim, rng: np.random.Generator) -> QuantumCircuit:
+    """
+    Transpile a single obfuscation trial, regenerating its random circuits if the transpiler rejects them.
+    Args:
+        trial_idx (int): Index of the trial, used for logging.
+        qc (QuantumCircuit): The circuit built for this trial.
+        gate (Gate | QuantumCircuit): The gate block inserted in the circuit.
+        start_idx (int): The starting qubit index of the gate block.
+        sim (AerSimulator): The backend to transpile for.
+        rng (np.random.Generator): Source of seeds for regenerated random circuits.
+    Returns:
+        QuantumCircuit: The transpiled circuit.
+    """
+    # Retry mechanism for valid circuit generation (random generation will occasionally break transpiler)
+    max_retries = 10
+
+    for attempt in range(max_retries):
+        try:
+            return transpile(qc, sim, optimization_level=0)
+
+        except TranspilerError as e:
+            print(f"[DEBUG] Exception in trial {trial_idx + 1}, attempt {attempt + 1}: {type(e).__name__}")
+            print(f"[DEBUG] Error at: {str(e)[:150]}")
+            if attempt == max_retries - 1:
+                print(f"\n[ERROR] Failed to generate valid circuit after {max_retries} attempts in trial {trial_idx + 1}")
+                print(f"[ERROR] Final error details: {e}")
+                raise
+            # Retry with new random circuit
+            print(f"[DEBUG] Retrying... (attempt {attempt + 2}/{max_retries})")
+            top_seed, bottom_seed = rng.integers(0, 2**31, size=2).tolist()
+            qc = build_obfuscated_circuit(
+                num_qubits=10,
+                gate=gate,
+                start_index=start_idx,
+                top_seed=top_seed,
+                bottom_seed=bottom_seed,
+            )
+
+
+def _lower_gate(gate) -> QuantumCircuit:
+    """
+    Transpile a gate block into the simulator's basis once, so every trial can inline the result.
+    Args:
+        gate (Gate): The gate block to lower.
+    Returns:
+        QuantumCircuit: The gate block expressed in the simulator's basis gates.
+    """
+    qc = QuantumCircuit(gate.num_qubits)
+    qc.append(gate, range(gate.num_qubits))
+    return transpile(qc, _simulator(), optimization_level=0)
+
+
+def _simulate_trials(
+    start_indices: list,
+    obfuscation_interval: int,
+    gate,
+    rng: np.random.Generator,
+    seed: Optional[int],
+    pool_size: Optional[int] = None,
+    max_parallel_experiments: int = 1,
+):
+    """
+    Build, transpile and simulate one obfuscation trial per start index as a single simulator job.
+    Args:
+        start_indices (list): Start index of the gate block for each trial.
+        obfuscation_interval (int): Number of shots per obfuscation trial.
+        gate (Gate): The gate block to insert.
+        rng (np.random.Generator): Source of seeds for the random circuits.
+        seed (int | None): Simulator seed; None leaves shot sampling unseeded.
+        pool_size (int | None): If set, draw random-circuit seeds from a pool of this many values,
+            so each random circuit is generated once per width and reused across trials.
+        max_parallel_experiments (int): Number of trials Aer may simulate at once; 1 runs them serially
+            and 0 uses up to the simulator's max_parallel_threads.
+    Returns:
+        Result: Simulator result holding one experiment per trial, in order.
+    """
+    num_trials = len(start_indices)
+    lowered_gate = _lower_gate(gate)
+    if pool_size is None:
+        # Every seed is a fresh draw, so there is nothing to reuse
+        block_cache = None
+        top_seeds = rng.integers(0, 2**31, size=num_trials).tolist()
+        bottom_seeds = rng.integers(0, 2**31, size=num_trials).tolist()
+    else:
+        block_cache = {}
+        pool = rng.integers(0, 2**31, size=pool_size)
+        top_seeds = rng.choice(pool, size=num_trials).tolist()
+        bottom_seeds = rng.choice(pool, size=num_trials).tolist()
+
+    # Build every trial up front, keeping its start index for bit recovery
+    circuits = [
+        build_obfuscated_circuit(
+            num_qubits=10,
+            gate=lowered_gate,
+            start_index=start_idx,
+            top_seed=top_seed,
+            bottom_seed=bottom_seed,
+            block_cache=block_cache,
+        )
+        for start_idx, top_seed, bottom_seed in zip(start_indices, top_seeds, bottom_seeds)
+    ]
+
+    # The gate block is already lowered and the random blocks are expanded to native operations,
+    # so only trials that still contain something the simulator cannot run need transpiling
+    sim = _simulator()
+    native_ops = _native_ops()
+    pending = [trial_idx for trial_idx, qc in enumerate(circuits) if not native_ops.issuperset(qc.count_ops())]
+
+    try:
+        transpiled = transpile([circuits[trial_idx] for trial_idx in pending], sim, optimization_level=0)
+    except TranspilerError as e:
+        # Fall back to per-trial transpilation so only the offending trials are regenerated
+        print(f"[DEBUG] Batch transpile failed: {type(e).__name__}, transpiling trials individually")
+        transpiled = [
+            _transpile_trial(trial_idx, circuits[trial_idx], lowered_gate, start_indices[trial_idx], sim, rng)
+            for trial_idx in pending
+        ]
+
+    compiled = list(circuits)
+    for trial_idx, qc in zip(pending, transpiled):
+        compiled[trial_idx] = qc
+
+    # Trial circuits are too small for Aer to parallelize within one state, so callers may run experiments side by side instead
+    return sim.run(
+        compiled,
+        shots=obfuscation_interval,
+        seed_simulator=seed,
+        max_parallel_experiments=max_parallel_experiments,
+    ).result()
+
+
+def _accumulate_trials(result, start_indices: list, gate, first_trial: int = 0):
+    """
+    Accumulate the counts of consecutive trials into obfuscated and recovered count vectors.
+    Args:
+        result (Result): Simulator result holding one experiment per trial.
+        start_indices (list): Start index of the gate block for each accumulated trial.
+        gate (Gate): The gate block inserted in each trial.
+        first_trial (int): Experiment index in result of the first accumulated trial.
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Obfuscated and recovered count vectors of length 2**10,
+            indexed by integer outcome.
+    """
+    # Preallocate dense accumulators: every outcome, and the gate's qubits indexed by their integer value
+    gate_n = gate.num_qubits
+    mask = (1 << gate_n) - 1
+    res_arr = np.zeros(1 << 10, dtype=np.int64)
+    rec_arr = np.zeros(1 << gate_n, dtype=np.int64)
+
+    # Parse the outcomes of every trial in one pass: concatenate the 10-character bitstrings
+    # into a byte buffer and reduce each row of digits to its integer value
+    trial_counts = [result.get_counts(trial_idx) for trial_idx in range(first_trial, first_trial + len(start_indices))]
+    digits = np.frombuffer(''.join(chain.from_iterable(trial_counts)).encode('ascii'), dtype=np.uint8).reshape(-1, 10)
+    idx = (digits - ord('0')).astype(np.int64) @ (1 << np.arange(9, -1, -1))
+    vals = np.fromiter(chain.from_iterable(counts.values() for counts in trial_counts), dtype=np.int64, count=len(idx))
+    np.add.at(res_arr, idx, vals)
+
+    # Bitstrings are little-endian, so shifting by each trial's start index brings the gate's qubits to the low bits
+    shifts = np.repeat(start_indices, [len(counts) for counts in trial_counts])
+    np.add.at(rec_arr, (idx >> shifts) & mask, vals)
+
+    # Place recovered counts at the '0000xxx000' outcome, listing the gate's qubits in ascending order
+    recovered_index = np.array([int('0000' + format(i, f'0{gate_n}b')[::-1] + '000', 2) for i in range(1 << gate_n)])
+    recovered_arr = np.zeros(1 << 10, dtype=np.int64)
+    recovered_arr[recovered_index] = rec_arr
+
+    return (res_arr, recovered_arr)
+
+
+def _print_recovered(label: str, recovered_arr: np.ndarray):
+    """
+    Print the non-zero recovered counts of an obfuscation run.
+    Args:
+        label (str): Name of the obfuscation mode.
+        recovered_arr (np.ndarray): Recovered count vector indexed by integer outcome.
+    """
+    lines = (f"{outcome:010b}: {recovered_arr[outcome]}" for outcome in np.flatnonzero(recovered_arr))
+    print(f"\n=== {label} Obfuscation Recovered Counts ===\n" + "\n".join(lines))
+
+
 def run_obfuscation_simulation(
     num_shots: int,
     obfuscation_interval: int,
     gate,
     static: bool,
+    seed: Optional[int] = None,
+    pool_size: Optional[int] = None,
+    max_parallel_experiments: int = 1,
+    verbose: bool = False,
 ):
     """
     Run an obfuscation simulation with random circuits before and after the gate block.
+    All trials are transpiled together and submitted to the simulator as a single job.
     Args:
         num_shots (int): Total number of shots for the simulation.
         obfuscation_interval (int): Number of shots per obfuscation trial.
         gate (Gate): The gate block to insert.
         static (bool): If True, use a fixed start index; if False, randomize it.
+        seed (int | None): Seed for start indices and random circuits; None draws fresh entropy.
+        pool_size (int | None): If set, reuse random circuits from a pool of this many seeds per width.
+        max_parallel_experiments (int): Number of trials Aer may simulate at once; 1 runs them serially
+            and 0 uses up to the simulator's max_parallel_threads.
+        verbose (bool): If True, print the recovered counts.
     Returns:
-        dict: Measurement counts from the obfuscation simulation.
+        tuple[np.ndarray, np.ndarray]: Obfuscated and recovered count vectors of length 2**10,
+            indexed by integer outcome.
     """
-    res = defaultdict(int)
-    recovered_res = defaultdict(int)
     num_trials = num_shots // obfuscation_interval
+    if num_trials == 0:
+        # No complete trial fits in num_shots, and Aer rejects an empty job
+        return (np.zeros(1 << 10, dtype=np.int64), np.zeros(1 << 10, dtype=np.int64))
 
-    for trial_idx in range(num_trials):
-        # Retry mechanism for valid circuit generation (random generation will occasionally break transpiler)
-        max_retries = 10
-
-        for attempt in range(max_retries):
-            try:
-                start_idx = 3 if static else random.randint(0, 7)
-
-                # Build circuit with gate at random/fixed position
-                qc = build_circuit_with_gate(
-                    num_qubits=10,
-                    gate=gate,
-                    start_index=start_idx,
-                    measure=False,
-                )
-
-                # Random circuit BEFORE gate
-                if start_idx > 0:
-                    rand_top = random_circuit(
-                        num_qubits=start_idx,
-                        depth=4,
-                        max_operands=2,
-                    )
-                    qc.compose(rand_top, qubits=list(range(start_idx)), inplace=True)
-
-                # Random circuit AFTER gate
-                end_idx = start_idx + gate.num_qubits
-                if end_idx < 10:
-                    rand_bottom = random_circuit(
-                        num_qubits=10 - end_idx,
-                        depth=4,
-                        max_operands=2,
-                    )
-                    qc.compose(rand_bottom, qubits=list(range(end_idx, 10)), inplace=True)
-
-                qc.measure_all()
-                counts = simulate_circuit(qc, shots=obfuscation_interval)
-
-                # Success - break out of retry loop
-                break
-
-            except BaseException as e:
-                print(f"[DEBUG] Exception in trial {trial_idx + 1}, attempt {attempt + 1}: {type(e).__name__}")
-                print(f"[DEBUG] Error at: {str(e)[:150]}")
-                if attempt == max_retries - 1:
-                    print(f"\n[ERROR] Failed to generate valid circuit after {max_retries} attempts in trial {trial_idx + 1}")
-                    print(f"[ERROR] Final error details: {e}")
-                    raise
-                # Retry with new random circuit
-                print(f"[DEBUG] Retrying... (attempt {attempt + 2}/{max_retries})")
-                continue
-
-        # Process results after successful simulation
-        for outcome, count in counts.items():
-            res[outcome] += count
-
-            # Extract result bits based on start index
-            bits = outcome[::-1]
-            result_bits = ''.join(
-                bits[start_idx + i] for i in range(gate.num_qubits)
-            )
-            recovered_res['0000' + result_bits + '000'] += count
+    # Draw all start indices and random-circuit seeds from one generator so a seed reproduces the whole run
+    rng = np.random.default_rng(seed)
+    if static:
+        start_indices = [3] * num_trials
+    else:
+        start_indices = rng.integers(0, 8, size=num_trials).tolist()
+
+    result = _simulate_trials(start_indices, obfuscation_interval, gate, rng, seed, pool_size, max_parallel_experiments)
+    res_arr, recovered_arr = _accumulate_trials(result, start_indices, gate)
+
+    if verbose:
+        _print_recovered('Static' if static else 'Dynamic', recovered_arr)
+    return (res_arr, recovered_arr)
+
+
+def run_obfuscation_both(
+    num_shots: int,
+    obfuscation_interval: int,
+    gate,
+    seed: Optional[int] = None,
+    pool_size: Optional[int] = None,
+    max_parallel_experiments: int = 1,
+    verbose: bool = False,
+):
+    """
+    Run the static and dynamic obfuscation simulations together.
+    The trials of both modes share one transpile call and one simulator job.
+    Args:
+        num_shots (int): Total number of shots for each mode.
+        obfuscation_interval (int): Number of shots per obfuscation trial.
+        gate (Gate): The gate block to insert.
+        seed (int | None): Seed for start indices and random circuits; None draws fresh entropy.
+        pool_size (int | None): If set, reuse random circuits from a pool of this many seeds per width.
+        max_parallel_experiments (int): Number of trials Aer may simulate at once; 1 runs them serially
+            and 0 uses up to the simulator's max_parallel_threads.
+        verbose (bool): If True, print the recovered counts.
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: Static obfuscated, static recovered,
+            dynamic obfuscated and dynamic recovered count vectors of length 2**10.
+    """
+    num_trials = num_shots // obfuscation_interval
+    if num_trials == 0:
+        # No complete trial fits in num_shots, and Aer rejects an empty job
+        return tuple(np.zeros(1 << 10, dtype=np.int64) for _ in range(4))
+
+    # Static trials come first in the batch, followed by the dynamic ones
+    rng = np.random.default_rng(seed)
+    static_indices = [3] * num_trials
+    dynamic_indices = rng.integers(0, 8, size=num_trials).tolist()
 
-    print(f"\n=== {'Static' if static else 'Dynamic'} Obfuscation Recovered Counts ===")
-    for key in sorted(recovered_res):
-        print(f"{key}: {recovered_res[key]}")
+    result = _simulate_trials(static_indices + dynamic_indices, obfuscation_interval, gate, rng, seed, pool_size, max_parallel_experiments)
+    static_obf, static_recovered = _accumulate_trials(result, static_indices, gate)
+    dynamic_obf, dynamic_recovered = _accumulate_trials(result, dynamic_indices, gate, first_trial=num_trials)
 
-    return (dict(res), dict(recovered_res))
\ No newline at end of file
+    if verbose:
+        _print_recovered('Static', static_recovered)
+        _print_recovered('Dynamic', dynamic_recovered)
+    return (static_obf, static_recovered, dynamic_obf, dynamic_recovered)
@@ -0,0 +1,96 @@
+import os
+import re
+import shutil
+
+import matplotlib
+matplotlib.use('Agg')
+import numpy as np
+import pytest
+from analyze import analyze_results, counts_to_vec, dominant_state_percentile, total_variation_distance
+from load import load_gate
+from simulation import run_baseline_simulation, run_obfuscation_both
+
+
+NUM_SHOTS = 1000
+W_EXPECTED = {'0000100000': NUM_SHOTS / 3, '0000010000': NUM_SHOTS / 3, '0000001000': NUM_SHOTS / 3}
+
+
+def vec_to_counts(vec: np.ndarray) -> dict:
+    """Convert a dense count vector back to a dict of its non-zero bitstring counts."""
+    return {format(outcome, '010b'): int(vec[outcome]) for outcome in np.flatnonzero(vec)}
+
+
+@pytest.fixture(scope="module")
+def w_results(tmp_path_factory):
+    """Seeded W-state baseline and obfuscation counts, loaded from a copy of the circuit."""
+    qasm_path = str(tmp_path_factory.mktemp("circuits") / "wstate.qasm")
+    shutil.copy("circuits/wstate_indep_qiskit_3.qasm", qasm_path)
+    gate = load_gate(qasm_path)
+
+    baseline = run_baseline_simulation(num_shots=NUM_SHOTS, gate=gate)
+    return (baseline,) + run_obfuscation_both(NUM_SHOTS, 10, gate, seed=1)
+
+
+def printed_metrics(output: str, section: str) -> dict:
+    """Parse the '  Label: value' lines printed under a metrics section."""
+    block = output.split(section)[1].split("\n\n")[0]
+    return {label: float(value) for label, value in re.findall(r"^  (\w+): ([\d.]+)%?$", block, re.MULTILINE)}
+
+
+class TestCountsToVec:
+    """Unit tests for the counts_to_vec function."""
+
+    def test_dict_becomes_dense_vector(self):
+        """Test that each bitstring count lands at its integer index."""
+        vec = counts_to_vec({'0000000101': 3, '1000000000': 2}, 10)
+        assert vec.shape == (1 << 10,)
+        assert vec[5] == 3 and vec[512] == 2
+        assert vec.sum() == 5
+
+    def test_vector_passes_through(self):
+        """Test that an existing count vector is returned unchanged."""
+        vec = np.arange(1 << 10)
+        assert counts_to_vec(vec, 10) is vec
+
+
+class TestAnalyzeResults:
+    """Unit tests comparing analyze_results with the dict-based metric functions."""
+
+    def test_metrics_match_dict_functions(self, w_results, tmp_path, monkeypatch, capsys):
+        """Test that the stacked count matrix reports the same metrics as the per-dict functions."""
+        baseline, static_obf, static_recovered, dynamic_obf, dynamic_recovered = w_results
+        monkeypatch.chdir(tmp_path)
+
+        analyze_results("w_gate", counts_to_vec(W_EXPECTED, 10), baseline, static_obf, static_recovered,
+                        dynamic_obf, dynamic_recovered, NUM_SHOTS)
+        output = capsys.readouterr().out
+
+        baseline, static_obf, static_recovered, dynamic_obf, dynamic_recovered = (
+            counts if isinstance(counts, dict) else vec_to_counts(counts)
+            for counts in w_results
+        )
+        expected_recovered = {
+            "Baseline": total_variation_distance(baseline, W_EXPECTED, NUM_SHOTS),
+            "Static": total_variation_distance(static_recovered, W_EXPECTED, NUM_SHOTS),
+            "Dynamic": total_variation_distance(dynamic_recovered, W_EXPECTED, NUM_SHOTS),
+        }
+        expected_actual = {
+            "Baseline": total_variation_distance(baseline, W_EXPECTED, NUM_SHOTS),
+            "Static": total_variation_distance(static_obf, W_EXPECTED, NUM_SHOTS),
+            "Dynamic": total_variation_distance(dynamic_obf, W_EXPECTED, NUM_SHOTS),
+        }
+        expected_dominant = {
+            "Expected": dominant_state_percentile(W_EXPECTED, NUM_SHOTS),
+            "Baseline": dominant_state_percentile(baseline, NUM_SHOTS),
+            "Static": dominant_state_percentile(static_obf, NUM_SHOTS),
+            "Dynamic": dominant_state_percentile(dynamic_obf, NUM_SHOTS),
+        }
+
+        assert printed_metrics(output, "Recovered Distributions TVD:") == pytest.approx(expected_recovered, abs=1e-4)
+        assert printed_metrics(output, "Actual Distributions TVD:") == pytest.approx(expected_actual, abs=1e-4)
+        assert printed_metrics(output, "Dominant State Percentile (Top-1):") == pytest.approx(expected_dominant, abs=1e-2)
+        assert os.path.exists(tmp_path / "obfuscation_analysis_w_gate.png")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
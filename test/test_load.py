@@ -1,48 +1,77 @@
+import os
+import shutil
+
 import pytest
 from qiskit import QuantumCircuit
 from qiskit.circuit import Gate, Instruction
+from qiskit.qpy import QpyError
+import load
 from load import load_gate
 
 
+# Test data: (circuit_path, expected_num_qubits, description)
+CIRCUITS = [
+    ("circuits/ghz_indep_qiskit_3.qasm", 3, "GHZ"),
+    ("circuits/wstate_indep_qiskit_3.qasm", 3, "W-state"),
+    ("circuits/grover-noancilla_indep_qiskit_3.qasm", 3, "Grover"),
+    ("circuits/qft_indep_qiskit_3.qasm", 3, "QFT"),
+]
+
+
+@pytest.fixture(scope="session")
+def gates(tmp_path_factory):
+    """Load each test circuit once per session, keyed by its path.
+    Loads from a fresh copy so every run parses the QASM and never writes into circuits/."""
+    tmp_dir = tmp_path_factory.mktemp("circuits")
+    loaded = {}
+    for path, _, _ in CIRCUITS:
+        copy_path = str(tmp_dir / os.path.basename(path))
+        shutil.copy(path, copy_path)
+        loaded[path] = load_gate(copy_path)
+    return loaded
+
+
+@pytest.fixture
+def qasm_copy(tmp_path):
+    """Copy the GHZ circuit into a temporary directory and clear the in-process cache around the test."""
+    copy_path = str(tmp_path / "ghz.qasm")
+    shutil.copy(CIRCUITS[0][0], copy_path)
+    load_gate.cache_clear()
+    yield copy_path
+    load_gate.cache_clear()
+
+
 class TestLoadGate:
     """Unit tests for the load_gate function."""
 
-    # Test data: (circuit_path, expected_num_qubits, description)
-    CIRCUITS = [
-        ("circuits/ghz_indep_qiskit_3.qasm", 3, "GHZ"),
-        ("circuits/wstate_indep_qiskit_3.qasm", 3, "W-state"),
-        ("circuits/grover-noancilla_indep_qiskit_3.qasm", 3, "Grover"),
-        ("circuits/qft_indep_qiskit_3.qasm", 3, "QFT"),
-    ]
-
     @pytest.mark.parametrize("circuit_path,expected_qubits,description", CIRCUITS)
-    def test_load_gate_returns_instruction(self, circuit_path, expected_qubits, description):
+    def test_load_gate_returns_instruction(self, gates, circuit_path, expected_qubits, description):
         """Test that load_gate returns an Instruction object."""
-        gate = load_gate(circuit_path)
+        gate = gates[circuit_path]
         assert isinstance(gate, Instruction), (
             f"{description}: Expected Instruction, got {type(gate)}"
         )
 
     @pytest.mark.parametrize("circuit_path,expected_qubits,description", CIRCUITS)
-    def test_load_gate_correct_num_qubits(self, circuit_path, expected_qubits, description):
+    def test_load_gate_correct_num_qubits(self, gates, circuit_path, expected_qubits, description):
         """Test that loaded gates have the correct number of qubits."""
-        gate = load_gate(circuit_path)
+        gate = gates[circuit_path]
         assert gate.num_qubits == expected_qubits, (
             f"{description}: Expected {expected_qubits} qubits, got {gate.num_qubits}"
         )
 
     @pytest.mark.parametrize("circuit_path,expected_qubits,description", CIRCUITS)
-    def test_load_gate_no_classical_bits(self, circuit_path, expected_qubits, description):
+    def test_load_gate_no_classical_bits(self, gates, circuit_path, expected_qubits, description):
         """Test that loaded gates have no classical bits."""
-        gate = load_gate(circuit_path)
+        gate = gates[circuit_path]
         assert gate.num_clbits == 0, (
             f"{description}: Expected 0 classical bits, got {gate.num_clbits}"
         )
 
     @pytest.mark.parametrize("circuit_path,expected_qubits,description", CIRCUITS)
-    def test_load_gate_has_instructions(self, circuit_path, expected_qubits, description):
+    def test_load_gate_has_instructions(self, gates, circuit_path, expected_qubits, description):
         """Test that loaded gates contain instructions (not empty)."""
-        gate = load_gate(circuit_path)
+        gate = gates[circuit_path]
         # Convert gate to circuit to inspect instructions
         qc = QuantumCircuit(gate.num_qubits)
         qc.append(gate, range(gate.num_qubits))
@@ -52,9 +81,9 @@ class TestLoadGate:
         )
 
     @pytest.mark.parametrize("circuit_path,expected_qubits,description", CIRCUITS)
-    def test_load_gate_can_be_appended(self, circuit_path, expected_qubits, description):
+    def test_load_gate_can_be_appended(self, gates, circuit_path, expected_qubits, description):
         """Test that loaded gates can be appended to a quantum circuit."""
-        gate = load_gate(circuit_path)
+        gate = gates[circuit_path]
         qc = QuantumCircuit(5)  # Create circuit with more qubits than gate needs
 
         # Should be able to append the gate
@@ -68,9 +97,9 @@ class TestLoadGate:
         )
 
     @pytest.mark.parametrize("circuit_path,expected_qubits,description", CIRCUITS)
-    def test_load_gate_has_name(self, circuit_path, expected_qubits, description):
+    def test_load_gate_has_name(self, gates, circuit_path, expected_qubits, description):
         """Test that loaded gates have a name attribute."""
-        gate = load_gate(circuit_path)
+        gate = gates[circuit_path]
         assert hasattr(gate, 'name'), f"{description}: Gate missing 'name' attribute"
         assert isinstance(gate.name, str), (
             f"{description}: Gate name should be string, got {type(gate.name)}"
@@ -82,20 +111,20 @@ class TestLoadGate:
         with pytest.raises(FileNotFoundError):
             load_gate("circuits/nonexistent.qasm")
 
-    def test_load_all_gates_different(self):
+    def test_load_all_gates_different(self, gates):
         """Test that all four gates are distinct (different names or structures)."""
-        gates = [load_gate(path) for path, _, _ in self.CIRCUITS]
+        loaded = [gates[path] for path, _, _ in CIRCUITS]
 
         # At minimum, check they're all valid gates
-        assert len(gates) == 4, "Should load 4 gates"
-        assert all(isinstance(g, Instruction) for g in gates), "All should be Instructions"
-        assert all(g.num_qubits == 3 for g in gates), "All should have 3 qubits"
-        assert all(g.num_clbits == 0 for g in gates), "All should have 0 classical bits"
+        assert len(loaded) == 4, "Should load 4 gates"
+        assert all(isinstance(g, Instruction) for g in loaded), "All should be Instructions"
+        assert all(g.num_qubits == 3 for g in loaded), "All should have 3 qubits"
+        assert all(g.num_clbits == 0 for g in loaded), "All should have 0 classical bits"
 
     @pytest.mark.parametrize("circuit_path,expected_qubits,description", CIRCUITS)
-    def test_load_gate_no_measurements(self, circuit_path, expected_qubits, description):
+    def test_load_gate_no_measurements(self, gates, circuit_path, expected_qubits, description):
         """Test that loaded gates don't contain measurement operations."""
-        gate = load_gate(circuit_path)
+        gate = gates[circuit_path]
 
         # Convert to circuit and decompose to check for measurements
         qc = QuantumCircuit(gate.num_qubits)
@@ -109,5 +138,60 @@ class TestLoadGate:
             )
 
 
+
+class TestLoadGateCache:
+    """Unit tests for the QPY cache written next to each QASM file."""
+
+    def test_cache_written_on_first_load(self, qasm_copy):
+        """Test that the first load writes a QPY cache that reproduces the gate."""
+        gate = load_gate(qasm_copy)
+        assert os.path.exists(qasm_copy + ".qpy"), "Expected a QPY cache next to the QASM file"
+
+        load_gate.cache_clear()
+        cached = load_gate(qasm_copy)
+        assert cached.num_qubits == gate.num_qubits
+        assert cached.num_clbits == 0
+        assert cached.definition == gate.definition
+
+    def test_cache_invalidated_by_newer_qasm(self, qasm_copy):
+        """Test that a QASM file newer than its cache is parsed again."""
+        load_gate(qasm_copy)
+        cache_mtime = os.path.getmtime(qasm_copy + ".qpy")
+
+        # Replace the circuit with a single-gate one and make it newer than the cache
+        with open(qasm_copy, "w") as f:
+            f.write('OPENQASM 2.0;\ninclude "qelib1.inc";\nqreg q[2];\ncreg c[2];\nh q[0];\nmeasure q -> c;\n')
+        os.utime(qasm_copy, (cache_mtime + 10, cache_mtime + 10))
+        load_gate.cache_clear()
+
+        gate = load_gate(qasm_copy)
+        assert gate.num_qubits == 2, "Stale cache was used instead of the newer QASM file"
+        assert gate.num_clbits == 0
+
+    def test_corrupt_cache_falls_back_to_qasm(self, qasm_copy):
+        """Test that an unreadable cache is ignored and the QASM file is parsed instead."""
+        expected = load_gate(qasm_copy)
+        with open(qasm_copy + ".qpy", "wb") as f:
+            f.write(b"QISKIT")
+        load_gate.cache_clear()
+
+        gate = load_gate(qasm_copy)
+        assert gate.definition == expected.definition
+
+    @pytest.mark.parametrize("error", [PermissionError("read-only checkout"), QpyError("unsupported circuit")])
+    def test_unwritable_cache_falls_back_to_qasm(self, qasm_copy, monkeypatch, error):
+        """Test that a failed cache write still returns the gate and leaves no files behind."""
+        def failing_dump(qc, f):
+            f.write(b"QISKIT")
+            raise error
+
+        monkeypatch.setattr(load.qpy, "dump", failing_dump)
+        gate = load_gate(qasm_copy)
+
+        assert gate.num_qubits == 3
+        assert gate.num_clbits == 0
+        assert os.listdir(os.path.dirname(qasm_copy)) == ["ghz.qasm"]
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
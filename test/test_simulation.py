@@ -0,0 +1,216 @@
+import random
+from collections import Counter, defaultdict
+
+import numpy as np
+import pytest
+from qiskit import QuantumCircuit
+from qiskit.circuit import Gate
+from qiskit.circuit.random import random_circuit
+from qiskit.quantum_info import Operator
+import simulation
+from simulation import _accumulate_trials, _native_ops, _to_native
+
+
+class StubResult:
+    """Stand-in for an Aer Result that serves fixed counts per experiment index."""
+
+    def __init__(self, experiment_counts):
+        self.experiment_counts = experiment_counts
+
+    def get_counts(self, experiment):
+        return self.experiment_counts[experiment]
+
+
+def random_counts(rng: random.Random, num_outcomes: int = 6) -> dict:
+    """Draw a counts dict over random 10-bit outcomes."""
+    outcomes = {format(rng.getrandbits(10), '010b') for _ in range(num_outcomes)}
+    return {outcome: rng.randint(1, 20) for outcome in outcomes}
+
+
+def baseline_recovery(experiment_counts: list, start_indices: list, gate) -> tuple:
+    """Accumulate counts with the original per-outcome string slicing."""
+    res = defaultdict(int)
+    recovered_res = defaultdict(int)
+    for counts, start_idx in zip(experiment_counts, start_indices):
+        for outcome, count in counts.items():
+            res[outcome] += count
+            bits = outcome[::-1]
+            result_bits = ''.join(bits[start_idx + i] for i in range(gate.num_qubits))
+            recovered_res['0000' + result_bits + '000'] += count
+    return (dict(res), dict(recovered_res))
+
+
+def vec_to_counts(vec: np.ndarray) -> dict:
+    """Convert a dense count vector back to a dict of its non-zero bitstring counts."""
+    return {format(outcome, '010b'): int(vec[outcome]) for outcome in np.flatnonzero(vec)}
+
+
+@pytest.fixture
+def gate():
+    """A bare 3-qubit gate; accumulation only reads its width."""
+    return Gate("block", 3, [])
+
+
+class TestAccumulateTrials:
+    """Unit tests for the _accumulate_trials function."""
+
+    @pytest.mark.parametrize("start_idx", [0, 1, 3, 5, 7])
+    def test_matches_baseline_for_fixed_start(self, gate, start_idx):
+        """Test that every trial at one start index matches the string-slicing recovery."""
+        rng = random.Random(start_idx)
+        experiment_counts = [random_counts(rng) for _ in range(8)]
+        start_indices = [start_idx] * len(experiment_counts)
+
+        res_arr, recovered_arr = _accumulate_trials(StubResult(experiment_counts), start_indices, gate)
+        res, recovered_res = baseline_recovery(experiment_counts, start_indices, gate)
+
+        assert vec_to_counts(res_arr) == res
+        assert vec_to_counts(recovered_arr) == recovered_res
+
+    def test_matches_baseline_for_mixed_starts(self, gate):
+        """Test that trials with different start indices are each shifted by their own index."""
+        rng = random.Random(42)
+        start_indices = [0, 7, 3, 1, 6, 2, 5, 4, 7, 0]
+        experiment_counts = [random_counts(rng) for _ in start_indices]
+
+        res_arr, recovered_arr = _accumulate_trials(StubResult(experiment_counts), start_indices, gate)
+        res, recovered_res = baseline_recovery(experiment_counts, start_indices, gate)
+
+        assert vec_to_counts(res_arr) == res
+        assert vec_to_counts(recovered_arr) == recovered_res
+
+    def test_recovered_gate_bits_in_ascending_order(self, gate):
+        """Test that qubit start_idx + i lands at position 4 + i of the recovered bitstring."""
+        # Qubit 2 set, read from the right of the little-endian outcome
+        outcome = '0000000100'
+        _, recovered_arr = _accumulate_trials(StubResult([{outcome: 5}]), [2], gate)
+
+        assert vec_to_counts(recovered_arr) == {'0000100000': 5}
+
+
+class TestRunObfuscationBoth:
+    """Unit tests for the static/dynamic split of run_obfuscation_both."""
+
+    def test_each_mode_accumulates_only_its_own_trials(self, gate, monkeypatch):
+        """Test that static trials come first in the batch and dynamic trials follow."""
+        num_trials = 6
+        rng = random.Random(7)
+        # Static outcomes all have the top bit set and dynamic ones never do, so any crossover shows up
+        static_counts = [{format(512 | rng.getrandbits(9), '010b'): rng.randint(1, 10)} for _ in range(num_trials)]
+        dynamic_counts = [{format(rng.getrandbits(9), '010b'): rng.randint(1, 10)} for _ in range(num_trials)]
+        batches = []
+
+        def fake_simulate_trials(start_indices, *args):
+            batches.append(start_indices)
+            return StubResult(static_counts + dynamic_counts)
+
+        monkeypatch.setattr(simulation, "_simulate_trials", fake_simulate_trials)
+        static_obf, static_recovered, dynamic_obf, dynamic_recovered = simulation.run_obfuscation_both(
+            num_shots=num_trials * 10, obfuscation_interval=10, gate=gate, seed=0,
+        )
+
+        assert len(batches) == 1, "Both modes should share one simulator job"
+        start_indices = batches[0]
+        assert start_indices[:num_trials] == [3] * num_trials
+
+        expected_static = baseline_recovery(static_counts, start_indices[:num_trials], gate)
+        expected_dynamic = baseline_recovery(dynamic_counts, start_indices[num_trials:], gate)
+        assert (vec_to_counts(static_obf), vec_to_counts(static_recovered)) == expected_static
+        assert (vec_to_counts(dynamic_obf), vec_to_counts(dynamic_recovered)) == expected_dynamic
+
+
+class TestTooFewShots:
+    """Unit tests for runs whose shots do not fill a single obfuscation trial."""
+
+    @pytest.mark.parametrize("static", [True, False])
+    def test_run_obfuscation_simulation_returns_empty_counts(self, gate, static):
+        """Test that fewer shots than one trial yields empty count vectors instead of an empty job."""
+        res_arr, recovered_arr = simulation.run_obfuscation_simulation(5, 10, gate, static=static)
+        for vec in (res_arr, recovered_arr):
+            assert vec.shape == (1 << 10,)
+            assert vec.dtype == np.int64
+            assert not vec.any()
+
+    def test_run_obfuscation_both_returns_empty_counts(self, gate):
+        """Test that both modes return empty count vectors when no trial fits."""
+        vecs = simulation.run_obfuscation_both(5, 10, gate)
+        assert len(vecs) == 4
+        for vec in vecs:
+            assert vec.shape == (1 << 10,)
+            assert vec.dtype == np.int64
+            assert not vec.any()
+
+
+class TestToNative:
+    """Unit tests for the _to_native expansion applied to every random block."""
+
+    @pytest.mark.parametrize("seed", range(20))
+    def test_random_circuit_equivalent_and_native(self, seed):
+        """Test that expanding a random circuit keeps its unitary and leaves only native operations."""
+        qc = random_circuit(num_qubits=5, depth=4, max_operands=2, seed=seed)
+        native = _to_native(qc)
+
+        assert _native_ops().issuperset(native.count_ops()), (
+            f"Non-native operations left: {set(native.count_ops()) - _native_ops()}"
+        )
+        assert Operator(qc).equiv(Operator(native)), "Expansion changed the circuit's unitary"
+
+    def test_operation_without_definition_passes_through(self):
+        """Test that an opaque operation is kept as is while the rest of the circuit is expanded."""
+        opaque = Gate("opaque", 1, [])
+        qc = QuantumCircuit(2)
+        qc.append(opaque, [1])
+        qc.iswap(0, 1)
+        native = _to_native(qc)
+
+        opaque_instructions = [instruction for instruction in native.data if instruction.operation.name == "opaque"]
+        assert len(opaque_instructions) == 1
+        assert opaque_instructions[0].operation is opaque
+        assert [native.find_bit(qubit).index for qubit in opaque_instructions[0].qubits] == [1]
+        assert "iswap" not in native.count_ops(), "Non-native operation after the opaque one was not expanded"
+
+
+@pytest.fixture
+def ghz_gate():
+    """A 3-qubit GHZ preparation gate to simulate end to end."""
+    qc = QuantumCircuit(3, name="ghz")
+    qc.h(0)
+    qc.cx(0, 1)
+    qc.cx(1, 2)
+    return qc.to_gate()
+
+
+class TestSeededRuns:
+    """Unit tests for the reproducibility of seeded obfuscation runs."""
+
+    @pytest.mark.parametrize("pool_size", [None, 4])
+    def test_seeded_runs_repeat_exactly(self, ghz_gate, pool_size):
+        """Test that two runs with the same seed return identical count vectors."""
+        first = simulation.run_obfuscation_both(200, 10, ghz_gate, seed=1, pool_size=pool_size)
+        second = simulation.run_obfuscation_both(200, 10, ghz_gate, seed=1, pool_size=pool_size)
+
+        for first_vec, second_vec in zip(first, second):
+            np.testing.assert_array_equal(first_vec, second_vec)
+
+    def test_pooled_run_generates_each_block_once(self, ghz_gate, monkeypatch):
+        """Test that a pooled run generates each (width, seed) random block only once."""
+        generated = Counter()
+        seeded_random_block = simulation._seeded_random_block
+
+        def counting_random_block(num_qubits, seed):
+            generated[(num_qubits, seed)] += 1
+            return seeded_random_block(num_qubits, seed)
+
+        monkeypatch.setattr(simulation, "_seeded_random_block", counting_random_block)
+        simulation.run_obfuscation_both(500, 10, ghz_gate, seed=1, pool_size=3)
+
+        assert generated, "Expected seeded random blocks to be generated"
+        assert max(generated.values()) == 1, (
+            f"Blocks generated more than once: {[key for key, count in generated.items() if count > 1]}"
+        )
+        # Random blocks are 1 to 7 qubits wide, so 3 pooled seeds allow at most 21 distinct blocks
+        assert len(generated) <= 7 * 3
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])